@@ -1,43 +1,188 @@
 import asyncio
+import copy
+import hashlib
+import importlib.util
+import io
 import json
 import logging
 import queue
-import tempfile
 import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Generator, Hashable, Optional
 
-import aspose_barcode_cloud
-from aspose_barcode_cloud.rest import ApiException
-from telegram import Update
+import httpx
+from telegram import Message, Update
+from telegram.constants import ChatAction
+from telegram.error import TelegramError
 from telegram.ext import Application, ApplicationBuilder, CommandHandler, ContextTypes, MessageHandler, filters
 
 import tkinter as tk
 from tkinter import simpledialog, messagebox
 from tkinter.scrolledtext import ScrolledText
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import uvloop
+except ImportError:  # pragma: no cover - not available on Windows
+    uvloop = None
+
 
 CONFIG_FILE = Path("config.json")
-LOG_QUEUE: "queue.Queue[str]" = queue.Queue()
+ASPOSE_API_HOST = "https://api.aspose.cloud/v4.0"
+ASPOSE_TOKEN_URL = "https://id.aspose.cloud/connect/token"
+# Refresh the JWT this many seconds before Aspose says it expires.
+ASPOSE_TOKEN_MARGIN = 60
+UPLOAD_JPEG_QUALITY = 90
+SCAN_MAX_SIDE = 800
+IMAGE_FILTER = filters.PHOTO | filters.Document.IMAGE
+RESULT_CACHE_SIZE = 1024
+MAX_IMAGE_SIZE = 10 * 1024 * 1024
+SUPPORTED_IMAGE_TYPES = frozenset(
+    {"image/jpeg", "image/png", "image/webp", "image/bmp", "image/gif", "image/tiff"}
+)
+LOG_QUEUE_SIZE = 4096
+LOG_QUEUE: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+LOG_FORMATTER = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
+LOG_MAX_LINES = 5000
+LOG_FALLBACK_POLL_MS = 500
+# Called after each record is queued, outside the handler lock; must not block. Set by BotApp.
+LOG_LISTENER: Optional[Callable[[], None]] = None
 
 
 class QueueLogger(logging.Handler):
+    """Queues records for the Tk thread, dropping the oldest ones when it falls behind."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def take_dropped(self) -> int:
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, 0
+        return dropped
+
     def emit(self, record: logging.LogRecord) -> None:
         try:
-            msg = self.format(record)
-            LOG_QUEUE.put(msg)
+            record = self.prepare(record)
+            # emit() runs under the handler lock, so only the consumer can race with us here.
+            try:
+                LOG_QUEUE.put_nowait(record)
+            except queue.Full:
+                try:
+                    LOG_QUEUE.get_nowait()
+                except queue.Empty:
+                    pass
+                else:
+                    with self._dropped_lock:
+                        self._dropped += 1
+                LOG_QUEUE.put_nowait(record)
         except Exception:  # pragma: no cover - safety net
             self.handleError(record)
 
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Same idea as logging.handlers.QueueHandler.prepare: merge args and render the
+        # traceback now, so later mutation or frame lifetimes cannot leak into the queue.
+        # Only the asctime/level layout is left for BotApp.drain_log_queue.
+        message = record.getMessage()
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            exc_text = LOG_FORMATTER.formatException(record.exc_info)
+        record = copy.copy(record)
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = exc_text
+        return record
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        handled = super().handle(record)
+        listener = LOG_LISTENER
+        if handled and listener is not None:
+            listener()
+        return handled
+
+
+def setup_logging() -> QueueLogger:
+    # None of these record attributes are shown by LOG_FORMATTER.
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
 
-def setup_logging() -> None:
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
     handler = QueueLogger()
-    formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
-    handler.setFormatter(formatter)
+    handler.setFormatter(LOG_FORMATTER)
     root_logger.addHandler(handler)
+    return handler
+
+
+class ResultCache:
+    """LRU map of recognized codes; only touched from the bot event loop."""
+
+    def __init__(self, maxsize: int) -> None:
+        self._maxsize = maxsize
+        self._items: "OrderedDict[Hashable, str]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[str]:
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: str) -> None:
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self._maxsize:
+            self._items.popitem(last=False)
+
+
+class AsposeTokenAuth(httpx.Auth):
+    """httpx auth flow that obtains an Aspose JWT and refreshes it before expiry or on 401."""
+
+    requires_response_body = True
+
+    def __init__(self, client_id: str, client_secret: str) -> None:
+        self._client_id = client_id
+        self._client_secret = client_secret
+        self._access_token: Optional[str] = None
+        self._expires_at = 0.0
+
+    def _build_token_request(self) -> httpx.Request:
+        return httpx.Request(
+            "POST",
+            ASPOSE_TOKEN_URL,
+            data={
+                "grant_type": "client_credentials",
+                "client_id": self._client_id,
+                "client_secret": self._client_secret,
+            },
+        )
+
+    def _update_token(self, response: httpx.Response) -> None:
+        response.raise_for_status()
+        payload = response.json()
+        self._access_token = payload["access_token"]
+        expires_in = float(payload.get("expires_in", 3600))
+        self._expires_at = time.monotonic() + max(0.0, expires_in - ASPOSE_TOKEN_MARGIN)
+
+    def auth_flow(self, request: httpx.Request) -> Generator[httpx.Request, httpx.Response, None]:
+        if self._access_token is None or time.monotonic() >= self._expires_at:
+            self._update_token((yield self._build_token_request()))
+        request.headers["Authorization"] = f"Bearer {self._access_token}"
+        response = yield request
+
+        if response.status_code == 401:
+            self._update_token((yield self._build_token_request()))
+            request.headers["Authorization"] = f"Bearer {self._access_token}"
+            yield request
 
 
 @dataclass
@@ -50,7 +195,10 @@ class BotConfig:
     def load(cls) -> Optional["BotConfig"]:
         if CONFIG_FILE.exists():
             try:
-                data = json.loads(CONFIG_FILE.read_text(encoding="utf-8"))
+                if orjson is not None:
+                    data = orjson.loads(CONFIG_FILE.read_bytes())
+                else:
+                    data = json.loads(CONFIG_FILE.read_text(encoding="utf-8"))
                 token = data.get("token", "").strip()
                 api_sid = data.get("api_sid", "").strip() or data.get("app_sid", "").strip()
                 api_key = data.get("api_key", "").strip() or data.get("app_key", "").strip()
@@ -62,18 +210,15 @@ class BotConfig:
         return None
 
     def save(self) -> None:
-        CONFIG_FILE.write_text(
-            json.dumps(
-                {
-                    "token": self.token,
-                    "api_sid": self.api_sid,
-                    "api_key": self.api_key,
-                },
-                ensure_ascii=False,
-                indent=2,
-            ),
-            encoding="utf-8",
-        )
+        data = {
+            "token": self.token,
+            "api_sid": self.api_sid,
+            "api_key": self.api_key,
+        }
+        if orjson is not None:
+            CONFIG_FILE.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        else:
+            CONFIG_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
         logging.info("Конфигурация сохранена в config.json")
 
 
@@ -230,8 +375,9 @@ class AsposeCredentialsDialog(ClipboardPasteMixin, simpledialog.Dialog):
 
 
 class BotApp:
-    def __init__(self, root: tk.Tk) -> None:
+    def __init__(self, root: tk.Tk, log_handler: Optional[QueueLogger] = None) -> None:
         self.root = root
+        self.log_handler = log_handler
         self.root.title("DataMatrix Telegram бот")
         self.root.geometry("720x480")
 
@@ -241,14 +387,32 @@ class BotApp:
 
         self.log_widget = ScrolledText(root, state="disabled", wrap="word", font=("Consolas", 10))
         self.log_widget.pack(fill="both", expand=True, padx=10, pady=10)
+        self._log_insert = self.log_widget.insert
+        self._log_configure = self.log_widget.configure
+        self._log_see = self.log_widget.see
+        self._log_delete = self.log_widget.delete
+        self._log_index = self.log_widget.index
+        self._log_wakeup = threading.Event()
 
         self._application: Optional[Application] = None
         self._bot_thread: Optional[threading.Thread] = None
         self._stop_event = threading.Event()
-        self._barcode_api: Optional["aspose_barcode_cloud.BarcodeApi"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_stop: Optional[asyncio.Event] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        # Keyed by file_unique_id, which unlike file_id is stable across bots and resends.
+        self._results_by_file = ResultCache(RESULT_CACHE_SIZE)
+        # Keyed by a content hash, for the same image uploaded as a different file.
+        self._results_by_content = ResultCache(RESULT_CACHE_SIZE)
 
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
-        self.root.after(200, self.poll_log_queue)
+        global LOG_LISTENER
+        if self.root.tk.call("info", "exists", "tcl_platform(threaded)"):
+            LOG_LISTENER = self._log_wakeup.set
+            threading.Thread(target=self.notify_log_drain, daemon=True).start()
+        else:
+            # Tcl without thread support cannot be called from other threads at all.
+            self.root.after(LOG_FALLBACK_POLL_MS, self.poll_log_queue)
 
         self.config = self.ensure_config()
         if (
@@ -307,21 +471,52 @@ class BotApp:
         config.save()
         return config
 
+    def notify_log_drain(self) -> None:
+        # Runs on its own thread: after_idle from a foreign thread blocks until Tk services it,
+        # so neither the logging thread nor the asyncio loop may make this call themselves.
+        while True:
+            self._log_wakeup.wait()
+            self._log_wakeup.clear()
+            while True:
+                try:
+                    self.root.after_idle(self.drain_log_queue)
+                except RuntimeError:
+                    # mainloop is not dispatching yet (e.g. a modal dialog is open); retry later.
+                    time.sleep(LOG_FALLBACK_POLL_MS / 1000)
+                except tk.TclError:
+                    return
+                else:
+                    break
+
     def poll_log_queue(self) -> None:
+        self.drain_log_queue()
+        self.root.after(LOG_FALLBACK_POLL_MS, self.poll_log_queue)
+
+    def drain_log_queue(self) -> None:
+        messages = []
         while True:
             try:
-                msg = LOG_QUEUE.get_nowait()
+                record = LOG_QUEUE.get_nowait()
             except queue.Empty:
                 break
-            else:
-                self.append_log(msg)
-        self.root.after(200, self.poll_log_queue)
+            try:
+                messages.append(LOG_FORMATTER.format(record))
+            except Exception as exc:
+                messages.append(f"... не удалось отформатировать запись журнала: {exc!r}")
+        dropped = self.log_handler.take_dropped() if self.log_handler is not None else 0
+        if dropped:
+            messages.insert(0, f"... пропущено строк журнала: {dropped}")
+        if messages:
+            self.append_log("\n".join(messages))
 
     def append_log(self, message: str) -> None:
-        self.log_widget.configure(state="normal")
-        self.log_widget.insert("end", message + "\n")
-        self.log_widget.configure(state="disabled")
-        self.log_widget.see("end")
+        self._log_configure(state="normal")
+        self._log_insert("end", message + "\n")
+        line_count = int(self._log_index("end-1c").split(".")[0])
+        if line_count > LOG_MAX_LINES:
+            self._log_delete("1.0", f"{line_count - LOG_MAX_LINES}.0")
+        self._log_configure(state="disabled")
+        self._log_see("end")
 
     def update_status(self, text: str) -> None:
         self.status_var.set(text)
@@ -335,29 +530,38 @@ class BotApp:
 
     def run_bot(self) -> None:
         assert self.config is not None
-        asyncio.run(self._run_async_bot(self.config))
+        loop_factory = uvloop.new_event_loop if uvloop is not None else None
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            runner.run(self._run_async_bot(self.config))
 
     async def _run_async_bot(self, config: BotConfig) -> None:
         logging.info("Инициализация телеграм-бота")
-
-        try:
-            configuration = aspose_barcode_cloud.Configuration()
-            configuration.api_key["app_sid"] = config.api_sid
-            configuration.api_key["api_key"] = config.api_key
-            api_client = aspose_barcode_cloud.ApiClient(configuration)
-            self._barcode_api = aspose_barcode_cloud.BarcodeApi(api_client)
-        except Exception as exc:
-            logging.exception("Не удалось инициализировать Aspose Barcode Cloud клиент: %s", exc)
-            self.update_status("Ошибка инициализации Aspose Barcode Cloud")
-            messagebox.showerror("Ошибка", f"Не удалось инициализировать Aspose Barcode Cloud: {exc}")
-            return
+        self._async_stop = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        if self._stop_event.is_set():
+            self._async_stop.set()
+
+        # httpx needs the optional h2 package for HTTP/2.
+        http2 = importlib.util.find_spec("h2") is not None
+        if not http2:
+            logging.warning("Пакет h2 не установлен, Aspose Barcode Cloud используется по HTTP/1.1")
+        self._http = httpx.AsyncClient(
+            base_url=ASPOSE_API_HOST,
+            http2=http2,
+            auth=AsposeTokenAuth(config.api_sid, config.api_key),
+            timeout=30.0,
+        )
 
         application = ApplicationBuilder().token(config.token).concurrent_updates(True).build()
 
-        application.add_handler(CommandHandler("start", self.cmd_start))
-        application.add_handler(CommandHandler("help", self.cmd_help))
-        application.add_handler(MessageHandler(filters.PHOTO | filters.Document.IMAGE, self.handle_image))
-        application.add_handler(MessageHandler(filters.COMMAND, self.unknown_command))
+        application.add_handlers(
+            [
+                CommandHandler("start", self.cmd_start),
+                CommandHandler("help", self.cmd_help),
+                MessageHandler(IMAGE_FILTER, self.handle_image),
+                MessageHandler(filters.COMMAND, self.unknown_command),
+            ]
+        )
 
         self._application = application
         try:
@@ -366,8 +570,7 @@ class BotApp:
             await application.start()
             logging.info("Бот подключен. Ожидание обновлений...")
             await application.updater.start_polling()
-            while not self._stop_event.is_set():
-                await asyncio.sleep(0.5)
+            await self._async_stop.wait()
         except Exception as exc:  # pragma: no cover - safety net
             logging.exception("Критическая ошибка работы бота: %s", exc)
             self.update_status("Ошибка: %s" % exc)
@@ -376,22 +579,28 @@ class BotApp:
             await self.shutdown_bot()
 
     async def shutdown_bot(self) -> None:
-        if self._application is None:
-            return
-        logging.info("Остановка бота")
         try:
-            await self._application.updater.stop()
-        except Exception:
-            pass
-        await self._application.stop()
-        await self._application.shutdown()
-        self.update_status("Бот остановлен")
+            if self._application is None:
+                return
+            logging.info("Остановка бота")
+            try:
+                await self._application.updater.stop()
+            except Exception:
+                pass
+            await self._application.stop()
+            await self._application.shutdown()
+            self.update_status("Бот остановлен")
+        finally:
+            # Application.stop() waits for running handlers, which may still be using the client.
+            if self._http is not None:
+                http, self._http = self._http, None
+                await http.aclose()
 
     def on_close(self) -> None:
         self._stop_event.set()
-        if self._application:
+        if self._loop is not None and self._async_stop is not None:
             try:
-                self._application.create_task(self.shutdown_bot())
+                self._loop.call_soon_threadsafe(self._async_stop.set)
             except RuntimeError:
                 pass
         self.root.after(500, self.root.destroy)
@@ -415,103 +624,176 @@ class BotApp:
             return
 
         file_id = None
+        full_file_id = None
+        unique_id = None
+        file_size = None
+        max_side = None
         if message.photo:
-            file_id = message.photo[-1].file_id
+            # Sizes are sorted ascending; the smallest one covering SCAN_MAX_SIDE needs no resize.
+            largest = message.photo[-1]
+            preview = next(
+                (size for size in message.photo if max(size.width, size.height) >= SCAN_MAX_SIDE),
+                largest,
+            )
+            file_id = preview.file_id
+            full_file_id = largest.file_id
+            unique_id = largest.file_unique_id
+            file_size = largest.file_size
+            max_side = SCAN_MAX_SIDE
         elif message.document:
-            file_id = message.document.file_id
+            if message.document.mime_type not in SUPPORTED_IMAGE_TYPES:
+                await message.reply_text(
+                    "Формат файла не поддерживается. Отправьте изображение JPEG, PNG, WebP, BMP, GIF или TIFF."
+                )
+                logging.warning("Отклонен файл с типом %s", message.document.mime_type)
+                return
+            file_id = full_file_id = message.document.file_id
+            unique_id = message.document.file_unique_id
+            file_size = message.document.file_size
 
         if not file_id:
             await message.reply_text("Не удалось получить изображение.")
             return
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp_file:
-            tmp_path = Path(tmp_file.name)
-
-        telegram_file = await context.bot.get_file(file_id)
-        await telegram_file.download_to_drive(custom_path=str(tmp_path))
-        logging.info("Изображение скачано: %s", tmp_path)
+        if file_size is not None and file_size > MAX_IMAGE_SIZE:
+            await message.reply_text("Изображение слишком большое. Максимальный размер — 10 МБ.")
+            logging.warning("Отклонено изображение размером %d байт", file_size)
+            return
 
-        if self._barcode_api is None:
+        if self._http is None:
             await message.reply_text("Сервис распознавания недоступен.")
             logging.error("Aspose Barcode Cloud клиент не инициализирован")
             return
 
-        try:
-            decoded_text = await asyncio.to_thread(decode_datamatrix, tmp_path, self._barcode_api)
+        decoded_text = self._results_by_file.get(unique_id)
+        if decoded_text:
+            logging.info("Код найден в кэше по идентификатору файла")
+        else:
+            decoded_text = await self.scan_image(message, context, file_id, full_file_id, max_side)
             if decoded_text:
-                await message.reply_text(f"Найденный код: {decoded_text}")
-                logging.info("Код успешно распознан: %s", decoded_text)
-            else:
-                await message.reply_text("Не удалось распознать DataMatrix на изображении.")
-                logging.warning("Aspose Barcode Cloud не нашел DataMatrix на изображении")
-        finally:
-            try:
-                tmp_path.unlink(missing_ok=True)
-            except Exception:
-                logging.warning("Не удалось удалить временный файл %s", tmp_path)
+                self._results_by_file.put(unique_id, decoded_text)
 
+        if decoded_text:
+            await message.reply_text(f"Найденный код: {decoded_text}")
+            logging.info("Код успешно распознан: %s", decoded_text)
+        else:
+            await message.reply_text("Не удалось распознать DataMatrix на изображении.")
+            logging.warning("Aspose Barcode Cloud не нашел DataMatrix на изображении")
+
+    async def scan_image(
+        self,
+        message: Message,
+        context: ContextTypes.DEFAULT_TYPE,
+        file_id: str,
+        full_file_id: str,
+        max_side: Optional[int],
+    ) -> Optional[str]:
+        # The typing indicator round-trip overlaps the download instead of preceding it.
+        image_data, _ = await asyncio.gather(
+            self.download_image(context, file_id),
+            self.send_typing(message),
+        )
+        content_key = hashlib.blake2b(image_data, digest_size=16).digest()
+        decoded_text = self._results_by_content.get(content_key)
+        if decoded_text:
+            logging.info("Код найден в кэше по содержимому изображения")
+            return decoded_text
+
+        scan_data = await asyncio.to_thread(prepare_image, image_data, max_side)
+        decoded_text = await self.recognize(scan_data)
+
+        if not decoded_text:
+            # Last chance, at the cost of one more paid API call: the untouched original,
+            # full-size for photos. Skipped when the first upload already was the original.
+            if full_file_id != file_id:
+                image_data = await self.download_image(context, full_file_id)
+            if image_data != scan_data:
+                logging.info("Повторное распознавание исходного изображения")
+                decoded_text = await self.recognize(image_data)
+
+        if decoded_text:
+            self._results_by_content.put(content_key, decoded_text)
+        return decoded_text
+
+    async def send_typing(self, message: Message) -> None:
+        try:
+            await message.reply_chat_action(ChatAction.TYPING)
+        except TelegramError as exc:
+            logging.warning("Не удалось отправить статус набора: %s", exc)
+
+    async def download_image(self, context: ContextTypes.DEFAULT_TYPE, file_id: str) -> bytes:
+        telegram_file = await context.bot.get_file(file_id)
+        image_data = bytes(await telegram_file.download_as_bytearray())
+        logging.info("Изображение скачано: %d байт", len(image_data))
+        return image_data
+
+    async def recognize(self, image_data: bytes) -> Optional[str]:
+        http = self._http
+        if http is None:
+            logging.error("Aspose Barcode Cloud клиент не инициализирован")
+            return None
+        return await decode_datamatrix_async(image_data, http)
+
+
+def prepare_image(image_data: bytes, max_side: Optional[int] = None) -> bytes:
+    """Re-encode the image as grayscale JPEG, keeping the original if that is not smaller."""
+    from PIL import Image
 
-def decode_datamatrix(
-    image_path: Path, barcode_api: "aspose_barcode_cloud.BarcodeApi"
-) -> Optional[str]:
     try:
-        image_data = image_path.read_bytes()
+        with Image.open(io.BytesIO(image_data)) as image:
+            width, height = image.size
+            scale = max_side / max(width, height) if max_side is not None else 1.0
+            target_size = (max(1, int(width * scale)), max(1, int(height * scale))) if scale < 1 else image.size
+            if image.format == "JPEG":
+                # libjpeg can decode straight to grayscale and pre-shrink by a power of two.
+                image.draft("L", target_size)
+            if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+                # Transparent pixels would otherwise turn black; flatten onto white like a viewer does.
+                rgba = image.convert("RGBA")
+                background = Image.new("RGBA", rgba.size, "white")
+                grayscale = Image.alpha_composite(background, rgba).convert("L")
+            elif image.mode != "L":
+                grayscale = image.convert("L")
+            else:
+                grayscale = image
+            if grayscale.size != target_size:
+                grayscale = grayscale.resize(target_size, Image.BILINEAR)
+            buffer = io.BytesIO()
+            grayscale.save(buffer, format="JPEG", quality=UPLOAD_JPEG_QUALITY)
     except Exception as exc:
-        logging.exception("Не удалось прочитать изображение для Aspose Barcode Cloud: %s", exc)
-        return None
+        logging.warning("Не удалось подготовить изображение, отправляется оригинал: %s", exc)
+        return image_data
 
-    try:
-        models_module = getattr(aspose_barcode_cloud, "models", None)
-        request = None
-        if models_module is not None:
-            request_cls = getattr(models_module, "PostBarcodeRecognizeFromUrlOrContentRequest", None)
-            if request_cls is not None:
-                request = request_cls(
-                    type="DataMatrix",
-                    preset="HighPerformance",
-                    fast_scan_only=False,
-                    image=image_data,
-                )
+    prepared = buffer.getvalue()
+    if len(prepared) >= len(image_data):
+        return image_data
+    return prepared
 
-        if request is not None:
-            response = barcode_api.post_barcode_recognize_from_url_or_content(request)
-        else:
-            response = barcode_api.post_barcode_recognize_from_url_or_content(
-                type="DataMatrix",
-                preset="HighPerformance",
-                fast_scan_only=False,
-                image=image_data,
-            )
-        response = barcode_api.barcode_scan_image(image_file=str(image_path))
-    except ApiException as exc:
+
+async def decode_datamatrix_async(image_data: bytes, http_client: httpx.AsyncClient) -> Optional[str]:
+    try:
+        response = await http_client.post(
+            "/barcode/recognize-multipart",
+            data={"barcodeType": "DataMatrix"},
+            files={"file": ("image", image_data, "application/octet-stream")},
+            headers={"Accept": "application/json"},
+        )
+        response.raise_for_status()
+        payload = response.json()
+    except httpx.HTTPStatusError as exc:
         logging.error("Ошибка Aspose Barcode Cloud при распознавании: %s", exc)
         return None
     except Exception as exc:
         logging.exception("Не удалось отправить изображение в Aspose Barcode Cloud: %s", exc)
         return None
 
-    if response is None:
-        logging.warning("Пустой ответ от Aspose Barcode Cloud")
-        return None
-
-    barcodes = (
-        getattr(response, "barcodes", None)
-        or getattr(response, "BarcodeList", None)
-        or getattr(response, "barcode_results", None)
-        or getattr(response, "BarcodeResults", None)
-    )
-
+    barcodes = payload.get("barcodes") if isinstance(payload, dict) else None
     if not barcodes:
         logging.info("Aspose Barcode Cloud не вернул распознанные штрихкоды")
         return None
 
     for barcode in barcodes:
-        value = (
-            getattr(barcode, "barcode_value", None)
-            or getattr(barcode, "BarcodeValue", None)
-            or getattr(barcode, "text", None)
-            or getattr(barcode, "CodeText", None)
-        )
+        value = barcode.get("barcodeValue")
         if value:
             return str(value)
 
@@ -520,9 +802,9 @@ def decode_datamatrix(
 
 
 def main() -> None:
-    setup_logging()
+    log_handler = setup_logging()
     root = tk.Tk()
-    BotApp(root)
+    BotApp(root, log_handler=log_handler)
     root.mainloop()
 
 